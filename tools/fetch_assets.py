@@ -3,55 +3,205 @@
 
 Usage:
   python tools/fetch_assets.py
-  python tools/fetch_assets.py --force
+  python tools/fetch_assets.py --ignore-cache
+  python tools/fetch_assets.py --jobs 4
 """
 
 from __future__ import annotations
 
 import argparse
-import json
+import concurrent.futures
+import contextlib
+import http.client
 import pathlib
+import shutil
 import sys
+import threading
 import urllib.error
 import urllib.parse
 import urllib.request
 
+from json_io import dump_json, load_json
+from net_retry import retry_transient
+
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 SOURCES_PATH = ROOT / "assets" / "manifest" / "sources.json"
 SOURCE_DIR = ROOT / "assets" / "source"
+IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".webp"})
+
+USER_AGENT = "MemoryGameAssetFetcher/1.0"
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Keep-alive connections, one per (scheme, host) for each worker thread.
+_connections = threading.local()
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Download raw source images for all cards.")
-    parser.add_argument("--force", action="store_true", help="Overwrite files if they already exist.")
+    parser.add_argument(
+        "--ignore-cache",
+        "--force",
+        dest="ignore_cache",
+        action="store_true",
+        help="Download every file even if the server reports the local copy as current.",
+    )
     parser.add_argument("--timeout", type=float, default=20.0, help="HTTP timeout in seconds.")
+    parser.add_argument("--jobs", type=int, default=8, help="Number of concurrent downloads.")
     return parser.parse_args()
 
 
 def load_manifest(path: pathlib.Path) -> dict:
     if not path.exists():
         raise FileNotFoundError(f"Missing manifest: {path}")
-    with path.open("r", encoding="utf-8") as handle:
-        return json.load(handle)
+    return load_json(path)
 
 
 def output_name(slug: str, url: str) -> pathlib.Path:
     parsed = urllib.parse.urlparse(url)
     ext = pathlib.Path(parsed.path).suffix.lower()
-    if ext not in {".jpg", ".jpeg", ".png", ".webp"}:
+    if ext not in IMAGE_EXTENSIONS:
         ext = ".jpg"
     return SOURCE_DIR / f"{slug}{ext}"
 
 
-def download_file(url: str, destination: pathlib.Path, timeout: float) -> None:
-    request = urllib.request.Request(url, headers={"User-Agent": "MemoryGameAssetFetcher/1.0"})
-    with urllib.request.urlopen(request, timeout=timeout) as response:
+def get_connection(scheme: str, host: str, timeout: float) -> http.client.HTTPConnection:
+    pool = getattr(_connections, "pool", None)
+    if pool is None:
+        pool = _connections.pool = {}
+    connection = pool.get((scheme, host))
+    if connection is None:
+        factory = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        connection = pool[(scheme, host)] = factory(host, timeout=timeout)
+    return connection
+
+
+def uses_proxy(url: str) -> bool:
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme not in urllib.request.getproxies():
+        return False
+    return not urllib.request.proxy_bypass(parsed.hostname or "")
+
+
+def open_via_urllib(url: str, timeout: float, headers: dict[str, str]):
+    """Plain urlopen, which honours HTTP(S)_PROXY/NO_PROXY; a 304 is returned like a response."""
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        return urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as exc:
+        if exc.code == http.client.NOT_MODIFIED:
+            return exc
+        raise
+
+
+@contextlib.contextmanager
+def open_url(url: str, timeout: float, headers: dict[str, str] | None = None):
+    """GET a URL over a pooled keep-alive connection, following redirects."""
+    request_headers = {"User-Agent": USER_AGENT, **(headers or {})}
+    if uses_proxy(url):
+        # The pooled connections talk to hosts directly, so leave proxied requests to urllib.
+        with open_via_urllib(url, timeout, request_headers) as response:
+            yield response
+        return
+
+    for _ in range(MAX_REDIRECTS + 1):
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {url}")
+        connection = get_connection(parsed.scheme, parsed.netloc, timeout)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        try:
+            connection.request("GET", path, headers=request_headers)
+            response = connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            raise
+
+        if response.status in REDIRECT_STATUSES:
+            location = response.getheader("Location")
+            response.read()
+            if not location:
+                raise urllib.error.HTTPError(url, response.status, "Redirect without Location", response.headers, None)
+            url = urllib.parse.urljoin(url, location)
+            continue
+
+        if response.status >= 400:
+            response.read()
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+
+        try:
+            yield response
+        finally:
+            # A partially read body leaves the socket unusable for the next request.
+            if not response.isclosed():
+                connection.close()
+        return
+
+    raise ValueError(f"Too many redirects: {url}")
+
+
+def validators_path(destination: pathlib.Path) -> pathlib.Path:
+    return destination.with_name(destination.name + ".meta")
+
+
+def conditional_headers(url: str, destination: pathlib.Path) -> dict[str, str]:
+    """Build If-None-Match/If-Modified-Since from the validators saved when destination was fetched from url."""
+    if not destination.exists():
+        return {}
+    try:
+        validators = load_json(validators_path(destination))
+    except (OSError, ValueError):
+        return {}
+    # A file downloaded from a different URL can't be revalidated against this one.
+    if not isinstance(validators, dict) or validators.get("url") != url:
+        return {}
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def save_validators(destination: pathlib.Path, url: str, response) -> None:
+    validators = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+    dump_json(validators_path(destination), validators)
+
+
+@retry_transient
+def download_file(url: str, destination: pathlib.Path, timeout: float, revalidate: bool = False) -> bool:
+    """Download url to destination; return False if the server says the existing file is current."""
+    headers = conditional_headers(url, destination) if revalidate else {}
+
+    with open_url(url, timeout=timeout, headers=headers) as response:
+        if response.status == http.client.NOT_MODIFIED:
+            response.read()
+            return False
         content_type = response.headers.get("Content-Type", "")
         if "image" not in content_type:
             raise RuntimeError(f"URL does not look like an image (Content-Type: {content_type})")
-        data = response.read()
-    destination.write_bytes(data)
+        # Stream into a temporary file so an interrupted download never leaves a truncated image behind.
+        partial = destination.with_name(destination.name + ".part")
+        try:
+            with partial.open("wb") as handle:
+                shutil.copyfileobj(response, handle, length=DOWNLOAD_CHUNK_SIZE)
+            # Drop the old validators first so they can never describe the new file.
+            validators_path(destination).unlink(missing_ok=True)
+            partial.replace(destination)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        save_validators(destination, url, response)
+    return True
 
 
 def main() -> int:
@@ -69,9 +219,14 @@ def main() -> int:
         print("No cards found in sources manifest.", file=sys.stderr)
         return 1
 
+    if args.jobs <= 0:
+        print("--jobs must be > 0", file=sys.stderr)
+        return 1
+
     success = 0
     skipped = 0
     failed = 0
+    pending: list[tuple[str, str, pathlib.Path]] = []
 
     for entry in cards:
         name = str(entry.get("name", "")).strip()
@@ -89,19 +244,26 @@ def main() -> int:
             continue
 
         destination = output_name(slug, url)
+        pending.append((name or slug, url, destination))
 
-        if destination.exists() and not args.force:
-            print(f"Skipping existing file: {destination}")
-            skipped += 1
-            continue
-
-        try:
-            download_file(url, destination, timeout=args.timeout)
-            print(f"Downloaded {name or slug} -> {destination}")
-            success += 1
-        except (urllib.error.URLError, TimeoutError, RuntimeError, OSError) as exc:
-            print(f"Failed {slug}: {exc}", file=sys.stderr)
-            failed += 1
+    # Downloads are I/O-bound, so a thread pool overlaps the per-request latency.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {
+            pool.submit(download_file, url, destination, args.timeout, not args.ignore_cache): (label, destination)
+            for label, url, destination in pending
+        }
+        for future in concurrent.futures.as_completed(futures):
+            label, destination = futures[future]
+            try:
+                if future.result():
+                    print(f"Downloaded {label} -> {destination}")
+                    success += 1
+                else:
+                    print(f"Not modified, keeping existing file: {destination}")
+                    skipped += 1
+            except (urllib.error.URLError, http.client.HTTPException, ValueError, RuntimeError, OSError) as exc:
+                print(f"Failed {destination.stem}: {exc}", file=sys.stderr)
+                failed += 1
 
     print(
         f"\nDone. success={success} skipped={skipped} failed={failed} "
@@ -0,0 +1,31 @@
+"""JSON helpers shared by the asset scripts; orjson is used when installed."""
+
+from __future__ import annotations
+
+import json
+import pathlib
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup, stdlib json is the fallback
+    orjson = None
+
+
+def loads(data: bytes) -> object:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_json(path: pathlib.Path) -> object:
+    return loads(path.read_bytes())
+
+
+def dump_json(path: pathlib.Path, data: object) -> None:
+    """Write data as 2-space indented UTF-8 JSON with a trailing newline."""
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+        return
+    with path.open("w", encoding="utf-8") as handle:
+        json.dump(data, handle, indent=2, ensure_ascii=False)
+        handle.write("\n")
@@ -0,0 +1,40 @@
+"""Retry helper shared by the asset scripts' network calls."""
+
+from __future__ import annotations
+
+import functools
+import http.client
+import time
+import urllib.error
+
+
+RETRY_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+
+# Failures worth another attempt; anything else (bad URL, disk full, 404) fails immediately.
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, http.client.HTTPException)
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, urllib.error.HTTPError):
+        return exc.code == 429 or exc.code >= 500
+    if isinstance(exc, urllib.error.URLError):
+        return isinstance(exc.reason, TRANSIENT_ERRORS)
+    return isinstance(exc, TRANSIENT_ERRORS)
+
+
+def retry_transient(func):
+    """Retry network calls that fail transiently, backing off exponentially."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(1, RETRY_ATTEMPTS + 1):
+            try:
+                return func(*args, **kwargs)
+            except Exception as exc:  # noqa: BLE001
+                if attempt == RETRY_ATTEMPTS or not is_transient(exc):
+                    raise
+                time.sleep(min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+    return wrapper
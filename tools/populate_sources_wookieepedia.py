@@ -3,22 +3,33 @@
 
 Primary source: Wookieepedia MediaWiki API (pageimages original image URL).
 One explicit override is used for Darth Vader to avoid duplicate art with Anakin.
+
+Usage:
+  python tools/populate_sources_wookieepedia.py
+  python tools/populate_sources_wookieepedia.py --refresh
 """
 
 from __future__ import annotations
 
-import json
+import argparse
 import pathlib
 import urllib.parse
 import urllib.request
 
+from json_io import dump_json, load_json, loads
+from net_retry import retry_transient
+
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 SOURCES_PATH = ROOT / "assets" / "manifest" / "sources.json"
 
 API_BASE = "https://starwars.fandom.com/api.php"
+REVISION_MARKER = "/revision/"
 USER_AGENT = "MemoryGameAssetBot/1.0 (local project setup)"
 
+# MediaWiki caps anonymous multi-title queries at 50 titles.
+MAX_TITLES_PER_QUERY = 50
+
 # Maps manifest slug -> Wookieepedia title
 TITLE_BY_SLUG = {
     "luke_skywalker": "Luke Skywalker",
@@ -45,48 +56,73 @@ OVERRIDE_URL_BY_SLUG = {
 }
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Fill sources.json image URLs from Wookieepedia.")
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Query the API even for cards that already have a URL.",
+    )
+    return parser.parse_args()
+
+
+@retry_transient
 def request_json(url: str) -> dict:
     req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
     with urllib.request.urlopen(req, timeout=20) as response:
-        return json.loads(response.read().decode("utf-8"))
+        return loads(response.read())
 
 
 def canonicalize_image_url(url: str) -> str:
     """Strip Fandom revision suffix so the direct file path keeps its extension."""
-    marker = "/revision/"
-    if marker in url:
-        return url.split(marker, maxsplit=1)[0]
-    return url
-
-
-def fetch_image_url(title: str) -> str:
-    params = {
-        "action": "query",
-        "format": "json",
-        "prop": "pageimages",
-        "piprop": "original",
-        "titles": title,
-        "redirects": "1",
-    }
-    url = API_BASE + "?" + urllib.parse.urlencode(params)
-    payload = request_json(url)
-    pages = payload.get("query", {}).get("pages", {})
-    for page in pages.values():
-        source = page.get("original", {}).get("source")
-        if source:
-            return canonicalize_image_url(source)
-    raise RuntimeError(f"No page image found for title '{title}'.")
+    return url.partition(REVISION_MARKER)[0]
+
+
+def fetch_image_urls(titles: list[str]) -> dict[str, str]:
+    """Resolve page image URLs for many titles, batching them into as few API calls as possible."""
+    image_by_title: dict[str, str] = {}
+    for start in range(0, len(titles), MAX_TITLES_PER_QUERY):
+        batch = titles[start : start + MAX_TITLES_PER_QUERY]
+        params = {
+            "action": "query",
+            "format": "json",
+            # Compact envelope: pages as a list, raw UTF-8 instead of \u escapes.
+            "formatversion": "2",
+            "prop": "pageimages",
+            "piprop": "original",
+            "titles": "|".join(batch),
+            "redirects": "1",
+        }
+        url = API_BASE + "?" + urllib.parse.urlencode(params)
+        query = request_json(url).get("query", {})
+
+        source_by_page: dict[str, str] = {}
+        for page in query.get("pages", []):
+            source = page.get("original", {}).get("source")
+            if source:
+                source_by_page[page["title"]] = canonicalize_image_url(source)
+
+        # The API reports results under normalized/redirect-target titles; map them back to ours.
+        normalized = {item["from"]: item["to"] for item in query.get("normalized", [])}
+        redirects = {item["from"]: item["to"] for item in query.get("redirects", [])}
+        for title in batch:
+            resolved = normalized.get(title, title)
+            resolved = redirects.get(resolved, resolved)
+            if resolved in source_by_page:
+                image_by_title[title] = source_by_page[resolved]
+    return image_by_title
 
 
 def main() -> int:
-    with SOURCES_PATH.open("r", encoding="utf-8") as handle:
-        manifest = json.load(handle)
+    args = parse_args()
+    manifest = load_json(SOURCES_PATH)
 
     cards = manifest.get("cards", [])
     if not isinstance(cards, list):
         raise RuntimeError("Invalid sources manifest format: expected cards list.")
 
     failures = 0
+    pending: list[tuple[dict, str, str]] = []
     for card in cards:
         slug = str(card.get("slug", "")).strip()
         if not slug:
@@ -98,6 +134,10 @@ def main() -> int:
             print(f"set {slug}: override URL")
             continue
 
+        if card.get("url") and not args.refresh:
+            print(f"kept {slug}: existing URL")
+            continue
+
         title = TITLE_BY_SLUG.get(slug)
         if not title:
             print(f"missing title mapping for slug: {slug}")
@@ -105,17 +145,24 @@ def main() -> int:
             failures += 1
             continue
 
-        try:
-            card["url"] = fetch_image_url(title)
+        pending.append((card, slug, title))
+
+    try:
+        image_by_title = fetch_image_urls([title for _, _, title in pending])
+    except Exception as exc:  # noqa: BLE001
+        print(f"failed to query {API_BASE}: {exc}")
+        image_by_title = {}
+
+    for card, slug, title in pending:
+        if title in image_by_title:
+            card["url"] = image_by_title[title]
             print(f"set {slug}: {card['url']}")
-        except Exception as exc:  # noqa: BLE001
-            print(f"failed {slug}: {exc}")
+        else:
+            print(f"failed {slug}: No page image found for title '{title}'.")
             card["url"] = ""
             failures += 1
 
-    with SOURCES_PATH.open("w", encoding="utf-8") as handle:
-        json.dump(manifest, handle, indent=2, ensure_ascii=False)
-        handle.write("\n")
+    dump_json(SOURCES_PATH, manifest)
 
     print(f"\nUpdated: {SOURCES_PATH}")
     if failures:
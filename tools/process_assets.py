@@ -4,27 +4,44 @@
 Usage:
   python tools/process_assets.py
   python tools/process_assets.py --height 256 --pixel-height 64 --quantize 24
+  python tools/process_assets.py --jobs 4
+  python tools/process_assets.py --force
 """
 
 from __future__ import annotations
 
 import argparse
-import json
+import concurrent.futures
+import hashlib
+import os
 import pathlib
 import sys
 
 try:
-    from PIL import Image
+    import PIL
+    from PIL import Image, features
 except ImportError as exc:  # pragma: no cover
     print("Pillow is required. Install with: pip install pillow", file=sys.stderr)
     raise SystemExit(1) from exc
 
+from json_io import load_json
+
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 CARDS_PATH = ROOT / "assets" / "manifest" / "cards.json"
 SOURCE_DIR = ROOT / "assets" / "source"
 PROCESSED_DIR = ROOT / "assets" / "processed"
 
+SOURCE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+# libimagequant gives the best palettes when Pillow is built with it; FASTOCTREE is the fast default.
+QUANTIZE_METHOD = (
+    Image.Quantize.LIBIMAGEQUANT if features.check_feature("libimagequant") else Image.Quantize.FASTOCTREE
+)
+
+# Bump when process_one changes its output so cached cards are regenerated.
+PIPELINE_VERSION = 3
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Convert source images into pixel-art PNG portraits.")
@@ -41,6 +58,17 @@ def parse_args() -> argparse.Namespace:
         default=28,
         help="Palette color count used before final upscale.",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: CPU count).",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Reprocess cards even if their output is up to date.",
+    )
     parser.add_argument(
         "--contact-sheet",
         action="store_true",
@@ -52,32 +80,61 @@ def parse_args() -> argparse.Namespace:
 def load_cards(path: pathlib.Path) -> list[dict]:
     if not path.exists():
         raise FileNotFoundError(f"Missing cards manifest: {path}")
-    with path.open("r", encoding="utf-8") as handle:
-        data = json.load(handle)
+    data = load_json(path)
     cards = data.get("cards", [])
     if not isinstance(cards, list):
         raise ValueError("cards.json format is invalid: expected key 'cards' as list.")
     return cards
 
 
-def find_source_image(slug: str) -> pathlib.Path | None:
-    for ext in (".png", ".jpg", ".jpeg", ".webp"):
-        candidate = SOURCE_DIR / f"{slug}{ext}"
-        if candidate.exists():
-            return candidate
-    return None
+def index_source_images(directory: pathlib.Path) -> dict[str, pathlib.Path]:
+    """Map slug -> source image with a single directory scan, preferring earlier SOURCE_EXTENSIONS."""
+    found: dict[str, pathlib.Path] = {}
+    if not directory.is_dir():
+        return found
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            ext = ext.lower()
+            if ext not in SOURCE_EXTENSIONS or not entry.is_file():
+                continue
+            current = found.get(stem)
+            if current is None or SOURCE_EXTENSIONS.index(ext) < SOURCE_EXTENSIONS.index(current.suffix.lower()):
+                found[stem] = pathlib.Path(entry.path)
+    return found
+
+
+def cache_key(source: pathlib.Path, args: argparse.Namespace) -> str:
+    stat = source.stat()
+    fingerprint = (
+        f"{PIPELINE_VERSION}:{PIL.__version__}:{int(QUANTIZE_METHOD)}:"
+        f"{args.height}:{args.pixel_height}:{args.quantize}:"
+        f"{source.name}:{stat.st_mtime_ns}:{stat.st_size}"
+    )
+    return hashlib.blake2b(fingerprint.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def cache_key_path(destination: pathlib.Path) -> pathlib.Path:
+    return destination.with_name(destination.name + ".key")
+
+
+def is_up_to_date(destination: pathlib.Path, key: str) -> bool:
+    try:
+        return destination.exists() and cache_key_path(destination).read_text(encoding="utf-8") == key
+    except OSError:
+        return False
 
 
-def center_crop_to_ratio(image: Image.Image, target_ratio: float) -> Image.Image:
-    width, height = image.size
+def center_crop_box(size: tuple[int, int], target_ratio: float) -> tuple[int, int, int, int]:
+    width, height = size
     current_ratio = width / height
     if current_ratio > target_ratio:
         new_width = int(height * target_ratio)
         x0 = (width - new_width) // 2
-        return image.crop((x0, 0, x0 + new_width, height))
+        return (x0, 0, x0 + new_width, height)
     new_height = int(width / target_ratio)
     y0 = (height - new_height) // 2
-    return image.crop((0, y0, width, y0 + new_height))
+    return (0, y0, width, y0 + new_height)
 
 
 def process_one(
@@ -88,21 +145,41 @@ def process_one(
     pixel_width: int,
     pixel_height: int,
     quantize: int,
-) -> None:
+    keep_image: bool = False,
+) -> Image.Image | None:
     with Image.open(source) as image:
+        if image.format == "JPEG":
+            # Let libjpeg scale during decode; the result stays at least 2x the largest size we need.
+            image.draft("RGB", (max(final_width, pixel_width) * 2, max(final_height, pixel_height) * 2))
         image = image.convert("RGB")
-        image = center_crop_to_ratio(image, target_ratio=3.0 / 4.0)
-        image = image.resize((pixel_width, pixel_height), Image.Resampling.NEAREST)
-        image = image.quantize(colors=max(2, quantize), method=Image.Quantize.MEDIANCUT).convert("RGB")
+        # Crop and downsample in a single resize call instead of materializing the cropped image.
+        crop = center_crop_box(image.size, target_ratio=3.0 / 4.0)
+        image = image.resize((pixel_width, pixel_height), Image.Resampling.BOX, box=crop)
+        # Quantize the small image and upscale the palette image directly; no RGB round trip.
+        image = image.quantize(
+            colors=max(2, quantize),
+            method=QUANTIZE_METHOD,
+            dither=Image.Dither.NONE,
+        )
         image = image.resize((final_width, final_height), Image.Resampling.NEAREST)
-        image.save(destination, format="PNG")
+        # Indexed PNG keeps the palette we just built: roughly a third of the bytes of 24-bit RGB.
+        # Save next to the destination and swap it in, so an interrupted run never leaves a truncated card.
+        partial = destination.with_name(destination.name + ".part")
+        try:
+            image.save(partial, format="PNG", optimize=True)
+            partial.replace(destination)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        # Only ship the image back to the parent process when the caller will use it.
+        return image if keep_image else None
 
 
-def create_contact_sheet(outputs: list[pathlib.Path], destination: pathlib.Path, tile_width: int, tile_height: int) -> None:
-    if not outputs:
+def create_contact_sheet(tiles: list[Image.Image], destination: pathlib.Path, tile_width: int, tile_height: int) -> None:
+    if not tiles:
         return
     columns = 4
-    rows = (len(outputs) + columns - 1) // columns
+    rows = (len(tiles) + columns - 1) // columns
     margin = 12
     sheet = Image.new(
         "RGB",
@@ -110,13 +187,12 @@ def create_contact_sheet(outputs: list[pathlib.Path], destination: pathlib.Path,
         color=(20, 20, 26),
     )
 
-    for index, output in enumerate(outputs):
-        with Image.open(output) as tile:
-            row = index // columns
-            column = index % columns
-            x = margin + column * (tile_width + margin)
-            y = margin + row * (tile_height + margin)
-            sheet.paste(tile, (x, y))
+    for index, tile in enumerate(tiles):
+        row = index // columns
+        column = index % columns
+        x = margin + column * (tile_width + margin)
+        y = margin + row * (tile_height + margin)
+        sheet.paste(tile, (x, y))
 
     sheet.save(destination, format="PNG")
 
@@ -135,14 +211,23 @@ def main() -> int:
         print("--height and --pixel-height must be > 0", file=sys.stderr)
         return 1
 
+    if args.jobs is not None and args.jobs <= 0:
+        print("--jobs must be > 0", file=sys.stderr)
+        return 1
+
     final_height = args.height
     final_width = max(1, int(round(final_height * (3.0 / 4.0))))
     pixel_height = args.pixel_height
     pixel_width = max(1, int(round(pixel_height * (3.0 / 4.0))))
 
-    processed_files: list[pathlib.Path] = []
     failures = 0
+    skipped = 0
+    outputs: list[pathlib.Path] = []
+    pending: list[tuple[str, pathlib.Path, pathlib.Path, str]] = []
+    # Destination -> freshly processed image, or None when it has to be read back from disk.
+    done: dict[pathlib.Path, Image.Image | None] = {}
 
+    source_by_slug = index_source_images(SOURCE_DIR)
     for card in cards:
         slug = str(card.get("slug", "")).strip()
         name = str(card.get("name", slug)).strip()
@@ -151,15 +236,29 @@ def main() -> int:
             failures += 1
             continue
 
-        source = find_source_image(slug)
+        source = source_by_slug.get(slug)
         if source is None:
             print(f"Missing source image for {slug} in {SOURCE_DIR}", file=sys.stderr)
             failures += 1
             continue
 
         destination = PROCESSED_DIR / f"{slug}.png"
-        try:
-            process_one(
+        outputs.append(destination)
+        key = cache_key(source, args)
+        if not args.force and is_up_to_date(destination, key):
+            print(f"Up to date {name} -> {destination}")
+            done[destination] = None
+            skipped += 1
+        else:
+            # Invalidate first: the key is only rewritten once the new output is fully in place.
+            cache_key_path(destination).unlink(missing_ok=True)
+            pending.append((name, source, destination, key))
+
+    # Each card is independent CPU-bound work, so spread it across processes.
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {
+            pool.submit(
+                process_one,
                 source,
                 destination,
                 final_width=final_width,
@@ -167,24 +266,44 @@ def main() -> int:
                 pixel_width=pixel_width,
                 pixel_height=pixel_height,
                 quantize=args.quantize,
-            )
-            print(f"Processed {name} -> {destination}")
-            processed_files.append(destination)
-        except OSError as exc:
-            print(f"Failed to process {slug}: {exc}", file=sys.stderr)
-            failures += 1
+                keep_image=args.contact_sheet,
+            ): (name, destination, key)
+            for name, source, destination, key in pending
+        }
+        for future in concurrent.futures.as_completed(futures):
+            name, destination, key = futures[future]
+            try:
+                image = future.result()
+                cache_key_path(destination).write_text(key, encoding="utf-8")
+                print(f"Processed {name} -> {destination}")
+                done[destination] = image
+            except OSError as exc:
+                print(f"Failed to process {destination.stem}: {exc}", file=sys.stderr)
+                failures += 1
+
+    # Keep manifest order for the contact sheet regardless of completion order.
+    processed_files: list[tuple[pathlib.Path, Image.Image | None]] = [
+        (destination, done[destination]) for destination in outputs if destination in done
+    ]
 
     if args.contact_sheet:
         contact_sheet_path = PROCESSED_DIR / "contact_sheet.png"
+        tiles: list[Image.Image] = []
+        for output, image in processed_files:
+            if image is None:
+                # Cached cards were not processed in this run, so decode them from disk.
+                with Image.open(output) as tile:
+                    image = tile.convert("RGB")
+            tiles.append(image)
         create_contact_sheet(
-            processed_files,
+            tiles,
             contact_sheet_path,
             tile_width=final_width,
             tile_height=final_height,
         )
         print(f"Generated contact sheet -> {contact_sheet_path}")
 
-    print(f"\nDone. processed={len(processed_files)} failed={failures}")
+    print(f"\nDone. processed={len(processed_files) - skipped} skipped={skipped} failed={failures}")
     return 1 if failures else 0
 
 